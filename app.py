@@ -1,7 +1,7 @@
 import streamlit as st
-import google.generativeai as genai
 import os
-import re # Import regular expressions for parsing
+
+from response_parser import parse_ai_response
 
 # --- Configuration ---
 # (Keep the API key configuration as before)
@@ -13,126 +13,151 @@ except (FileNotFoundError, KeyError):
     if not GOOGLE_API_KEY:
         st.warning("⚠️ Google API Key not found. Please set it in Streamlit Secrets or as an environment variable (GOOGLE_API_KEY). Features will be limited.")
 
-genai_configured = False
-if GOOGLE_API_KEY:
+@st.cache_resource
+def get_model(api_key):
+    """
+    Configures the Gemini SDK and builds the model once per API key.
+    Streamlit reruns the script on every interaction, so the cached client is reused across reruns.
+    The SDK (and its grpc/protobuf chain) is imported here so the UI can render before it is needed.
+    """
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-1.5-flash') # Or 'gemini-pro'
+
+# The model itself is only built on the first Analyze click (see Processing and Output)
+genai_configured = bool(GOOGLE_API_KEY)
+
+
+# --- Cached AI Analysis ---
+# Compact prompt: same structural contract as the parser expects, far fewer input tokens.
+# Pre-split around the user's code so building it is a single str.join.
+_PROMPT_PREFIX = (
+    "Find the errors in the code below, fix them and suggest improvements. "
+    "Respond EXACTLY with these markdown headings:\n"
+    "## Error Details\n(concise explanation of each error)\n"
+    "## Corrected Code\n(one ```python fenced block with ONLY the corrected input code)\n"
+    "## Suggestions\n(enhancements/best practices; brief code only if essential)\n\n"
+    "```python\n"
+)
+_PROMPT_SUFFIX = "\n```"
+
+
+class BlockedResponseError(Exception):
+    """
+    Raised when the AI response is empty, blocked, or stopped before finishing
+    (e.g. safety filters or the token limit). Never cached, so a retry reaches the API again.
+    """
+    def __init__(self, prompt_feedback, finish_reason=None):
+        super().__init__("The AI response was empty, blocked or incomplete.")
+        self.prompt_feedback = prompt_feedback
+        self.finish_reason = finish_reason # Name such as "SAFETY" or "MAX_TOKENS", if the stream stopped early
+
+
+class _CacheMiss(Exception):
+    """Raised by _cached_analysis when there is no stored result for the code yet."""
+
+
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def _cached_analysis(user_code, _ai_response_text=None):
+    """
+    Side-effect-free cache of analysis results, keyed on user_code only
+    (the leading underscore keeps the response text out of the hash).
+    Called with just the code it is a pure lookup: a miss raises _CacheMiss, and exceptions are never cached.
+    Called with a freshly streamed response, it parses it and stores the result.
+    Returns (parsed_sections, parsing_successful, raw_response_text).
+    """
+    if _ai_response_text is None:
+        raise _CacheMiss
+    parsed_sections, parsing_successful = parse_ai_response(_ai_response_text)
+    return parsed_sections, parsing_successful, _ai_response_text
+
+
+def _stream_response(model, user_code):
+    """
+    Sends the code to the model and streams the reply into a live preview as it is generated.
+    Lives outside the cache so the preview updates are never recorded for replay.
+    Returns the full response text; raises BlockedResponseError for empty, blocked
+    or cut-short responses so a partial reply is never cached.
+    """
+    # Already loaded by get_model, so this import is just a sys.modules lookup
+    from google.generativeai.types import BlockedPromptException
+
+    prompt = "".join((_PROMPT_PREFIX, user_code, _PROMPT_SUFFIX))
+
+    # Stream the reply so text shows up as it is generated instead of after completion
+    response = model.generate_content(prompt, stream=True)
+    chunks = []
+    placeholder = st.empty()
     try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash') # Or 'gemini-pro'
-        genai_configured = True
-    except Exception as e:
-        st.error(f"❌ Error configuring Google AI: {e}")
-else:
-     pass # Warning already shown if key missing
+        for chunk in response:
+            if chunk.parts:
+                chunks.append(chunk.text)
+                placeholder.markdown("".join(chunks))
+    except BlockedPromptException as e:
+        # A blocked prompt raises on the first iteration instead of yielding an empty chunk
+        blocked = e.args[0] if e.args else None
+        raise BlockedResponseError(getattr(blocked, "prompt_feedback", None)) from e
+    finally:
+        placeholder.empty() # Parsed sections (or the error) replace the live preview
+
+    # A stream that stops early (SAFETY, RECITATION, MAX_TOKENS, ...) doesn't raise;
+    # the chunks so far would look like a complete reply, so treat anything but STOP as failed
+    finish_reason = response.candidates[0].finish_reason.name if response.candidates else None
+    if not chunks or finish_reason != "STOP":
+        raise BlockedResponseError(response.prompt_feedback, finish_reason)
+
+    return "".join(chunks)
+
+
+def analyze_code(model, user_code):
+    """
+    Returns (parsed_sections, parsing_successful, raw_response_text) for the code.
+    Re-analyzing the same snippet is served from the cache; the model is only called,
+    and its reply streamed, on a cache miss.
+    """
+    try:
+        return _cached_analysis(user_code)
+    except _CacheMiss:
+        return _cached_analysis(user_code, _stream_response(model, user_code))
 
 
-# --- Improved Helper Function to Parse AI Response ---
-def parse_ai_response(response_text):
+# --- Result Rendering Helpers ---
+def _fenced_code(code, language):
     """
-    Parses the AI response text more robustly.
-    Looks for headings and extracts content between them or until the end.
-    Specifically isolates the code block under 'Corrected Code'.
-    Returns a dictionary with extracted sections and a boolean indicating overall parsing success.
+    Wraps code in a markdown fence that is longer than any backtick run inside it,
+    so code containing ``` cannot close the block early.
     """
-    sections = {
-        "error_details": None,
-        "corrected_code": None,
-        "suggestions": None
-    }
-    parsing_successful = True # Assume success initially
-
-    # --- Extract Error Details ---
-    # Look for Error Details heading, capture until the next heading or end of string
-    error_match = re.search(
-        r"## Error Details\s*(.*?)\s*(?=## Corrected Code|## Suggestions|\Z)",
-        response_text,
-        re.DOTALL | re.IGNORECASE
-    )
-    if error_match:
-        sections["error_details"] = error_match.group(1).strip()
-    else:
-        # Don't mark as total failure yet, maybe only suggestions are missing
-        if "error details" in response_text.lower():
-             sections["error_details"] = "[Parsing Error: Could not isolate Error Details section]"
-        parsing_successful = False # Essential part missing
-
-    # --- Extract Corrected Code ---
-    # Look for Corrected Code heading, then find the *first* code block immediately after it
-    corrected_code_heading_match = re.search(
-        r"## Corrected Code\s*",
-        response_text,
-        re.IGNORECASE
-    )
-    if corrected_code_heading_match:
-        # Start searching for the code block *after* the heading
-        search_start_index = corrected_code_heading_match.end()
-        code_block_match = re.search(
-            r"```(?:[a-zA-Z]*\n)?(.*?)\n```",
-            response_text[search_start_index:], # Search only in the remainder
-            re.DOTALL
-        )
-        if code_block_match:
-            sections["corrected_code"] = code_block_match.group(1).strip()
-        else:
-            # Heading found, but no code block right after?
-             if "corrected code" in response_text.lower(): # Check if the phrase exists at all
-                 sections["corrected_code"] = "[Parsing Error: Found 'Corrected Code' heading but no valid code block immediately after it]"
-             parsing_successful = False # Essential part missing or malformed
-    else:
-         if "corrected code" in response_text.lower():
-             sections["corrected_code"] = "[Parsing Error: Could not find '## Corrected Code' heading]"
-         parsing_successful = False # Essential part missing
-
-    # --- Extract Suggestions ---
-    # Look for Suggestions heading, capture everything *after* it until the end
-    suggestions_match = re.search(
-        r"## Suggestions\s*(.*)",
-        response_text,
-        re.DOTALL | re.IGNORECASE
-    )
-    if suggestions_match:
-        # Further check: Does the suggestion text *start* with a code block that might belong above?
-        # This is tricky, let's keep it simple for now and just extract everything.
-        # If the AI puts code here, it will show up here.
-        sections["suggestions"] = suggestions_match.group(1).strip()
-        # If suggestions are empty, that's okay, don't mark parsing as failed
-        if not sections["suggestions"]:
-             sections["suggestions"] = "[No specific suggestions provided.]"
-
-    else:
-        # Suggestions might be optional, so don't mark parsing as failed *just* for this
-        if "suggestions" in response_text.lower():
-             sections["suggestions"] = "[Parsing Error: Could not isolate Suggestions section]"
-        # If suggestions are truly missing, set to None or an indicator message
-        # sections["suggestions"] = None # Or keep as None if preferred
-
-    # Final check: If essential parts are missing, mark as failed.
-    if sections["error_details"] is None or sections["corrected_code"] is None:
-        # Check if the raw text actually contains keywords, indicating AI tried but format was wrong
-        if "error details" in response_text.lower() or "corrected code" in response_text.lower():
-             parsing_successful = False # Mark as failed if keywords present but parsing didn't get them
-        # If keywords aren't even present, maybe the AI response was validly short (e.g., no errors found)
-        # We rely on the initial True value unless specific failures occur.
-
-
-    # If all sections failed to parse AND the response wasn't empty
-    if response_text and not sections["error_details"] and not sections["corrected_code"] and not sections["suggestions"]:
-         parsing_successful = False # Definitely failed if response has text but nothing was extracted
-
-
-    return sections, parsing_successful
+    fence = "```"
+    while fence in code:
+        fence += "`"
+    return f"{fence}{language}\n{code}\n{fence}"
+
+
+def _flush_markdown(parts):
+    """Renders the accumulated markdown parts as a single element and empties the buffer."""
+    if parts:
+        st.markdown("\n\n".join(parts))
+        parts.clear()
 
 
 # --- Streamlit App UI ---
 # (Keep the UI section largely the same, including the input text_area with its key)
-st.set_page_config(page_title="BugFix AI", page_icon="🐞")
+# Static UI text is kept together in named constants for readability and easier translation later
+_PAGE_TITLE = "BugFix AI"
+_PAGE_ICON = "🐞"
+_TITLE = "🐞 BugFix AI"
+_INTRO = "Paste your code with errors below. The AI will analyze it, provide error details, suggest corrections, and offer enhancement ideas."
+_PLACEHOLDER = "def my_function(a, b):\n  print(a + b)\n\nmy_function(5, 'hello') # Error here!"
+
+st.set_page_config(page_title=_PAGE_TITLE, page_icon=_PAGE_ICON)
 
-st.title("🐞 BugFix AI")
-st.write("Paste your code with errors below. The AI will analyze it, provide error details, suggest corrections, and offer enhancement ideas.")
+st.title(_TITLE)
+st.write(_INTRO)
 
 user_code = st.text_area(
     "Enter your code here:",
     height=250,
-    placeholder="def my_function(a, b):\n  print(a + b)\n\nmy_function(5, 'hello') # Error here!",
+    placeholder=_PLACEHOLDER,
     key="user_code_input"
 )
 
@@ -141,97 +166,91 @@ analyze_button = st.button("Analyze and Fix Code", disabled=not genai_configured
 
 # --- Processing and Output ---
 
+model = None
 if analyze_button and user_code and genai_configured:
-    with st.spinner("AI is analyzing your code... 🧠"):
+    # First call imports and configures the SDK, which can take a moment
+    with st.spinner("Connecting to Google AI... 🔌"):
+        try:
+            model = get_model(GOOGLE_API_KEY)
+        except Exception as e:
+            st.error(f"❌ Error configuring Google AI: {e}")
+
+if model is not None:
+    results = st.container() # Every element the analysis renders goes into this one block
+    with st.spinner("AI is analyzing your code... 🧠"), results:
         try:
-            # --- Refined Prompt ---
-            prompt = f"""
-            Analyze the following code snippet for errors. Provide a detailed explanation of the errors found.
-            Then, provide the corrected version of the code.
-            Finally, offer suggestions for potential enhancements or best practices related to the code.
-
-            **IMPORTANT:** Structure your response *exactly* like this, using these specific markdown headings:
-
-            ## Error Details
-            [Your detailed explanation of errors found. Be clear and concise.]
-
-            ## Corrected Code
-            ```python
-            [ONLY the corrected version of the original input code goes here. Do NOT add example usage or other code blocks in this section.]
-            ```
-
-            ## Suggestions
-            [Your suggestions for enhancement or best practices. Explain your points clearly. Avoid putting full code examples here unless absolutely necessary for illustration, and if so, keep them brief.]
-
-            ---
-            Code to analyze:
-            ```python
-            {user_code}
-            ```
-            ---
-            """
-
-            # Send prompt to the Gemini model
-            response = model.generate_content(prompt)
-            ai_response_text = ""
-            parsing_successful = False
-            parsed_sections = {} # Initialize
-
-            if response.parts:
-                ai_response_text = response.text
-                parsed_sections, parsing_successful = parse_ai_response(ai_response_text)
-
-                st.subheader("Analysis Results:")
-
-                # Display Error Details
-                st.markdown("### 🧐 Error Details")
-                details = parsed_sections.get("error_details", "[No error details extracted.]")
-                if "[Parsing Error:" in details:
-                    st.warning(details)
-                elif details == "[No error details extracted.]" and not parsing_successful:
-                     st.info("Could not extract error details. The AI response might be malformed.")
-                elif details:
-                    st.markdown(details)
-                else: # Should not happen with .get default, but as fallback
+            parsed_sections, parsing_successful, ai_response_text = analyze_code(model, user_code)
+
+            st.subheader("Analysis Results:")
+
+            # Sections are accumulated as markdown and sent in as few elements as possible;
+            # warnings/infos flush the buffer first so the on-page order is kept.
+            # Free-form AI text (Error Details, Suggestions) always ends its element, so an
+            # unclosed ``` fence or stray markup in it can't swallow the sections that follow.
+            md = []
+
+            # Display Error Details
+            md.append("### 🧐 Error Details")
+            details = parsed_sections.get("error_details")
+            if details and "[Parsing Error:" in details:
+                _flush_markdown(md)
+                st.warning(details)
+            elif details:
+                md.append(details)
+                _flush_markdown(md)
+            else:
+                _flush_markdown(md)
+                if not parsing_successful:
+                    st.info("Could not extract error details. The AI response might be malformed.")
+                else:
                     st.info("No error details provided or extracted.")
 
 
-                # Display Corrected Code
-                st.markdown("### ✨ Corrected Code")
-                code = parsed_sections.get("corrected_code")
-                if code and "[Parsing Error:" in code:
-                    st.warning(code)
-                elif code:
-                     st.code(code, language="python") # Assume python
-                else:
-                     st.info("No corrected code provided or extracted.")
-                     if not parsing_successful:
-                         st.warning("Could not extract corrected code. The AI response might be malformed.")
-
-
-                # Display Suggestions
-                st.markdown("### 💡 Suggestions for Enhancement")
-                suggestions = parsed_sections.get("suggestions", "[No suggestions provided or extracted.]")
-                if "[Parsing Error:" in suggestions:
-                    st.warning(suggestions)
-                elif suggestions:
-                    st.markdown(suggestions)
-                else:
-                    st.info("No suggestions provided or extracted.")
+            # Display Corrected Code
+            md.append("### ✨ Corrected Code")
+            code = parsed_sections.get("corrected_code")
+            if code and "[Parsing Error:" in code:
+                _flush_markdown(md)
+                st.warning(code)
+            elif code:
+                 md.append(_fenced_code(code, "python")) # Assume python
+            else:
+                 _flush_markdown(md)
+                 st.info("No corrected code provided or extracted.")
+                 if not parsing_successful:
+                     st.warning("Could not extract corrected code. The AI response might be malformed.")
+
+
+            # Display Suggestions
+            md.append("### 💡 Suggestions for Enhancement")
+            suggestions = parsed_sections.get("suggestions")
+            if suggestions and "[Parsing Error:" in suggestions:
+                _flush_markdown(md)
+                st.warning(suggestions)
+            elif suggestions:
+                md.append(suggestions)
+            else:
+                _flush_markdown(md)
+                st.info("No suggestions provided or extracted.")
 
+            _flush_markdown(md)
 
-                # --- Consolidated Debug Output ---
-                if not parsing_successful and ai_response_text:
-                    st.warning("⚠️ The AI response format didn't perfectly match expectations, so parsing might be incomplete. Displaying the raw AI output below for reference.")
-                    st.text_area("Raw AI Response", ai_response_text, height=200, key="debug_raw_response_area")
 
-            else:
-                 # Handle blocked response
+            # --- Consolidated Debug Output ---
+            if not parsing_successful and ai_response_text:
+                st.warning("⚠️ The AI response format didn't perfectly match expectations, so parsing might be incomplete. Displaying the raw AI output below for reference.")
+                st.text_area("Raw AI Response", ai_response_text, height=200, key="debug_raw_response_area")
+
+        except BlockedResponseError as e:
+             # Handle blocked response
+             if e.finish_reason and e.finish_reason != "STOP":
+                 st.error(f"❌ The AI response stopped early ({e.finish_reason}), so the partial result was discarded. Please try again.")
+             else:
                  st.error("❌ The AI response was empty or blocked (potentially due to safety filters).")
-                 try:
-                     st.json({"prompt_feedback": response.prompt_feedback})
-                 except Exception:
-                     st.write("Could not retrieve prompt feedback.")
+             try:
+                 st.json({"prompt_feedback": e.prompt_feedback})
+             except Exception:
+                 st.write("Could not retrieve prompt feedback.")
 
         except Exception as e:
             st.error(f"An error occurred during AI interaction or processing: {e}")
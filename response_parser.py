@@ -0,0 +1,163 @@
+import functools
+import re # Import regular expressions for parsing
+from types import MappingProxyType
+
+# Parsing of the AI response lives in its own module: Streamlit re-executes app.py on every
+# rerun, but imported modules stay in sys.modules, so the compiled patterns and the parse
+# cache below are built once per process instead of once per interaction.
+
+# --- Section Headings for Parsing ---
+# (section key, heading title) in the order the prompt asks for them.
+# Every pattern below is derived from this table, so adding a section starts here.
+_SECTIONS = (
+    ("error_details", "Error Details"),
+    ("corrected_code", "Corrected Code"),
+    ("suggestions", "Suggestions"),
+)
+# Case-insensitive patterns run on the original text: no lowercased copy is ever built.
+# One alternation finds every heading in a single pass; the named group says which one.
+_HEADINGS_RE = re.compile(
+    "## (?:" + "|".join(f"(?P<{key}>{re.escape(title)})" for key, title in _SECTIONS) + ")",
+    re.IGNORECASE
+)
+# Keyword presence checks used to tell "missing" apart from "present but malformed"
+_HAS_KEYWORD = {key: re.compile(re.escape(title), re.IGNORECASE).search for key, title in _SECTIONS}
+_FENCE = "```"
+_CLOSING_FENCE = "\n```"
+
+
+def _find_headings(response_text):
+    """
+    Scans the text once and returns a dict mapping each section key to its first heading match.
+    Sections whose heading never appears are left out.
+    """
+    found = {}
+    for match in _HEADINGS_RE.finditer(response_text):
+        found.setdefault(match.lastgroup, match)
+        if len(found) == len(_SECTIONS):
+            break # All headings located; skip the rest of the text
+    return found
+
+
+def _stripped_slice(text, start, end):
+    """
+    Returns the whitespace-stripped section between two tracked offsets.
+    Sections are only materialized here, once the final bounds are known.
+    """
+    return text[start:end].strip()
+
+
+# --- Improved Helper Function to Parse AI Response ---
+def parse_ai_response(response_text):
+    """
+    Parses the AI response text more robustly.
+    Finds each heading offset once and slices the content between them or until the end.
+    Specifically isolates the code block under 'Corrected Code'.
+    Returns a dictionary with extracted sections and a boolean indicating overall parsing success.
+    Repeated calls with the same text are served from an in-process LRU cache, which
+    lives in this imported module so it survives Streamlit's reruns of app.py.
+    """
+    sections, parsing_successful = _parse_ai_response_cached(response_text)
+    return dict(sections), parsing_successful # Fresh dict so callers can't mutate the cache entry
+
+
+@functools.lru_cache(maxsize=64)
+def _parse_ai_response_cached(response_text):
+    """
+    Does the actual parsing for parse_ai_response.
+    Sections are returned as a read-only mapping because the result is shared by every cache hit.
+    """
+    sections = {key: None for key, _ in _SECTIONS}
+    parsing_successful = True # Assume success initially
+
+    if not response_text:
+        return MappingProxyType(sections), False # Nothing to parse
+
+    # Locate each heading once, directly on the original text
+    if "##" in response_text:
+        headings = _find_headings(response_text)
+    else:
+        # No markdown headings at all (e.g. a short refusal): skip the searches, go to the fallbacks
+        headings = {}
+    error_match = headings.get("error_details")
+    code_match = headings.get("corrected_code")
+    suggestions_match = headings.get("suggestions")
+
+    # --- Extract Error Details ---
+    # Capture from the Error Details heading until the next heading or end of string
+    if error_match:
+        body_start = error_match.end()
+        body_end = len(response_text)
+        other_matches = [m for key, m in headings.items() if key != "error_details"]
+        if any(m.start() < body_start for m in other_matches):
+            # Another heading comes first in the text, so scan forward from this section instead
+            for match in _HEADINGS_RE.finditer(response_text, body_start):
+                if match.lastgroup != "error_details":
+                    body_end = match.start()
+                    break
+        else:
+            # Reuse the matches found above
+            for next_match in other_matches:
+                body_end = min(body_end, next_match.start())
+        sections["error_details"] = _stripped_slice(response_text, body_start, body_end)
+    else:
+        # Don't mark as total failure yet, maybe only suggestions are missing
+        if _HAS_KEYWORD["error_details"](response_text):
+             sections["error_details"] = "[Parsing Error: Could not isolate Error Details section]"
+        parsing_successful = False # Essential part missing
+
+    # --- Extract Corrected Code ---
+    # Find the *first* fenced code block after the Corrected Code heading
+    if code_match:
+        code_bounds = None # (start, end) offsets of the block content
+        fence_start = response_text.find(_FENCE, code_match.end())
+        if fence_start >= 0:
+            body_start = fence_start + len(_FENCE)
+            # The closing fence must follow a newline, so nothing can match without one
+            line_end = response_text.find("\n", body_start)
+            if line_end >= 0:
+                lang = response_text[body_start:line_end]
+                if not lang or (lang.isascii() and lang.isalpha()):
+                    # Skip the optional language tag line such as "python\n"
+                    fence_end = response_text.find(_CLOSING_FENCE, line_end + 1)
+                    if fence_end >= 0:
+                        code_bounds = (line_end + 1, fence_end)
+                    elif response_text.startswith(_CLOSING_FENCE, line_end):
+                        # Empty block ("```python\n```"): the tag line is the only content
+                        code_bounds = (body_start, line_end)
+                else:
+                    # Not a language tag, so the block content starts right after the fence
+                    fence_end = response_text.find(_CLOSING_FENCE, line_end)
+                    if fence_end >= 0:
+                        code_bounds = (body_start, fence_end)
+        if code_bounds is not None:
+            sections["corrected_code"] = _stripped_slice(response_text, *code_bounds)
+        else:
+            # Heading found, but no code block right after?
+             sections["corrected_code"] = "[Parsing Error: Found 'Corrected Code' heading but no valid code block immediately after it]"
+             parsing_successful = False # Essential part missing or malformed
+    else:
+         if _HAS_KEYWORD["corrected_code"](response_text):
+             sections["corrected_code"] = "[Parsing Error: Could not find '## Corrected Code' heading]"
+         parsing_successful = False # Essential part missing
+
+    # --- Extract Suggestions ---
+    # Capture everything *after* the Suggestions heading until the end
+    if suggestions_match:
+        # If the AI puts code here, it will show up here.
+        sections["suggestions"] = _stripped_slice(response_text, suggestions_match.end(), len(response_text))
+        # If suggestions are empty, that's okay, don't mark parsing as failed
+        if not sections["suggestions"]:
+             sections["suggestions"] = "[No specific suggestions provided.]"
+
+    else:
+        # Suggestions might be optional, so don't mark parsing as failed *just* for this
+        if _HAS_KEYWORD["suggestions"](response_text):
+             sections["suggestions"] = "[Parsing Error: Could not isolate Suggestions section]"
+
+    # If all sections failed to parse AND the response wasn't empty
+    if response_text and not sections["error_details"] and not sections["corrected_code"] and not sections["suggestions"]:
+         parsing_successful = False # Definitely failed if response has text but nothing was extracted
+
+
+    return MappingProxyType(sections), parsing_successful